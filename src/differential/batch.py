@@ -0,0 +1,71 @@
+import typing
+
+from .expression import (Program, Dual, LOAD_X, LOAD_CONST, CALL, ADD, SUB, MUL, DIV,
+                         NEG, SIN, COS, SQRT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_UNARY, _BINARY = {NEG, SIN, COS, SQRT}, {ADD, SUB, MUL, DIV}
+
+def eval_array(program: Program, xs: typing.Any) -> Dual:
+    # Same forward-mode sweep as expression.run_dual, except that every entry
+    # is an array: each instruction is a single NumPy loop over the points.
+    if np is None:
+        raise ImportError("eval_array requires numpy")
+    x = np.asarray(xs, dtype=np.float64)
+    consts, calls = program.consts, program.calls
+    # Arrays are released after their last use, so that memory follows the
+    # width of the DAG rather than its size.
+    last_use = list(range(len(program)))
+    for i, op, l, r in zip(range(len(program)), program.opcodes, program.left, program.right):
+        if op in _UNARY or op in _BINARY:
+            last_use[l] = i
+        if op in _BINARY:
+            last_use[r] = i
+    vals = [None] * len(program)
+    ders = [None] * len(program)
+    with np.errstate(all="ignore"):
+        for i, op, l, r, arg in zip(range(len(program)), program.opcodes, program.left, program.right, program.args):
+            if op == LOAD_X:
+                vals[i], ders[i] = x, 1.0
+            elif op == LOAD_CONST:
+                vals[i], ders[i] = consts[arg], 0.0
+            elif op == CALL:
+                # Call leaves wrap scalar callables, applied point by point.
+                vals[i] = np.vectorize(calls[arg].fn, otypes=[np.float64])(x)
+                ders[i] = np.vectorize(calls[arg].derivative, otypes=[np.float64])(x)
+            elif op == ADD:
+                vals[i] = vals[l] + vals[r]
+                ders[i] = ders[l] + ders[r]
+            elif op == SUB:
+                vals[i] = vals[l] - vals[r]
+                ders[i] = ders[l] - ders[r]
+            elif op == MUL:
+                a, b = vals[l], vals[r]
+                vals[i] = a * b
+                ders[i] = a * ders[r] + ders[l] * b
+            elif op == DIV:
+                b = vals[r]
+                q = vals[i] = np.true_divide(vals[l], b)
+                ders[i] = np.true_divide(ders[l] - q * ders[r], b)
+            elif op == NEG:
+                vals[i], ders[i] = -vals[l], -ders[l]
+            elif op == SIN:
+                v = vals[l]
+                vals[i], ders[i] = np.sin(v), np.cos(v) * ders[l]
+            elif op == COS:
+                v = vals[l]
+                vals[i], ders[i] = np.cos(v), -np.sin(v) * ders[l]
+            elif op == SQRT:
+                s = np.sqrt(vals[l])
+                vals[i], ders[i] = s, np.true_divide(0.5 * ders[l], s)
+            if (op in _UNARY or op in _BINARY) and last_use[l] == i:
+                vals[l] = ders[l] = None
+            if op in _BINARY and last_use[r] == i:
+                vals[r] = ders[r] = None
+    # Constant subexpressions stay scalars until here; broadcast them to the points.
+    zeros = np.zeros_like(x)
+    return Dual(vals[-1] + zeros, ders[-1] + zeros)
@@ -0,0 +1,41 @@
+import hashlib, importlib.metadata, os, sys, tempfile
+
+from .expression import Program
+
+try:
+    VERSION = importlib.metadata.version("differential")
+except importlib.metadata.PackageNotFoundError:
+    VERSION = "dev"
+
+def cache_dir() -> str:
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "differential")
+
+def canonical_repr(program: Program) -> str:
+    # Programs are hash-consed, so equal expressions give equal arrays; the
+    # constants are spelled in hexadecimal to be exact.
+    return repr((list(program.opcodes), list(program.left), list(program.right), list(program.args),
+                 [float(k).hex() for k in program.consts]))
+
+def key(program: Program, backend: str) -> str:
+    # The library version and the interpreter tag invalidate artifacts built
+    # by another release or by an incompatible Python (marshal format, ABI).
+    prefix = f"{VERSION}:{sys.implementation.cache_tag}:{backend}:"
+    return hashlib.sha1((prefix + canonical_repr(program)).encode()).hexdigest()
+
+def path(name: str) -> str:
+    return os.path.join(cache_dir(), name)
+
+def store(name: str, data: bytes) -> None:
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    # Written aside and renamed, so that concurrent processes never read a
+    # partial artifact.
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path(name))
+    except BaseException:
+        os.unlink(tmp)
+        raise
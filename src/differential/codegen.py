@@ -0,0 +1,176 @@
+import ctypes, dataclasses, marshal, math, os, subprocess, tempfile, types, typing
+
+from . import cache
+from .expression import Program, Dual, LOAD_X, LOAD_CONST, CALL, ADD, SUB, MUL, DIV, NEG, SIN, COS, SQRT
+
+_ZERO, _ONE = "0.0", "1.0"
+
+def _times(a: str, b: str) -> str:
+    if a == _ZERO or b == _ZERO:
+        return _ZERO
+    return b if a == _ONE else a if b == _ONE else f"{a} * {b}"
+
+def _plus(a: str, b: str, sign: str = "+") -> str:
+    if b == _ZERO:
+        return a
+    if a == _ZERO:
+        return b if sign == "+" else f"-{b}"
+    return f"{a} {sign} {b}"
+
+def _straight_line(program: Program, literal: typing.Callable[[float], str]) -> tuple[list[tuple[str, str, str, str]], tuple[str, str]]:
+    # Translates a program into straight-line assignments, one pair of locals
+    # (value, derivative) per non-leaf entry, so that common subexpressions
+    # are kept. Leaves are inlined and derivative terms known to be 0 or 1 are
+    # simplified away. Operands are always names or literals, so the
+    # expressions need no parentheses beyond the ones emitted here.
+    names, statements = [], []
+    for i, op, l, r, arg in zip(range(len(program)), program.opcodes, program.left, program.right, program.args):
+        if op == LOAD_X:
+            names.append(("x", _ONE))
+            continue
+        if op == LOAD_CONST:
+            names.append((literal(program.consts[arg]), _ZERO))
+            continue
+        if op == CALL:
+            statements.append((f"v{i}", f"c{arg}(x)", f"d{i}", f"dc{arg}(x)"))
+            names.append((f"v{i}", f"d{i}"))
+            continue
+        (av, ad), (bv, bd) = names[l], names[r]
+        if op == ADD:
+            v, d = f"{av} + {bv}", _plus(ad, bd)
+        elif op == SUB:
+            v, d = f"{av} - {bv}", _plus(ad, bd, "-")
+        elif op == MUL:
+            v, d = f"{av} * {bv}", _plus(_times(av, bd), _times(ad, bv))
+        elif op == DIV:
+            numerator = _plus(ad, _times(f"v{i}", bd), "-")
+            v, d = f"{av} / {bv}", _ZERO if numerator == _ZERO else f"({numerator}) / {bv}"
+        elif op == NEG:
+            v, d = f"-{av}", _ZERO if ad == _ZERO else f"-{ad}"
+        elif op == SIN:
+            v, d = f"sin({av})", _times(f"cos({av})", ad)
+        elif op == COS:
+            v, d = f"cos({av})", _times(f"-sin({av})", ad)
+        elif op == SQRT:
+            v, d = f"sqrt({av})", _ZERO if ad == _ZERO else f"0.5 * {ad} / v{i}"
+        statements.append((f"v{i}", v, f"d{i}", d))
+        names.append((f"v{i}", f"d{i}"))
+    return statements, names[-1]
+
+def _c_literal(k: float) -> str:
+    k = float(k)
+    if math.isnan(k):
+        return "NAN"
+    if math.isinf(k):
+        return "INFINITY" if k > 0 else "(-INFINITY)"
+    # Hexadecimal literals round-trip every double exactly.
+    return f"({k.hex()})" if k < 0 else k.hex()
+
+def codegen_c(program: Program) -> str:
+    if program.calls:
+        raise ValueError("Call nodes cannot be translated to C")
+    statements, (v, d) = _straight_line(program, _c_literal)
+    body = "".join(f"    double {vn} = {vs};\n    double {dn} = {ds};\n" for vn, vs, dn, ds in statements)
+    return ("#include <math.h>\n\n"
+            f"double forward(double x, double *derivative) {{\n{body}"
+            f"    *derivative = {d};\n    return {v};\n}}\n")
+
+def _py_literal(k: float) -> str:
+    # repr() round-trips every float; inf and nan are names bound by compile_py.
+    k = float(k)
+    return f"({k!r})" if k < 0 else repr(k)
+
+def codegen_py(program: Program) -> str:
+    # Two functions: value() only runs the value assignments, so that it raises
+    # exactly where the bytecode would, and forward() runs both.
+    statements, (v, d) = _straight_line(program, _py_literal)
+    values = "".join(f"    {vn} = {vs}\n" for vn, vs, _, _ in statements)
+    duals  = "".join(f"    {vn} = {vs}\n    {dn} = {ds}\n" for vn, vs, dn, ds in statements)
+    return (f"def value(x):\n{values}    return {v}\n\n"
+            f"def forward(x):\n{duals}    return Dual({v}, {d})\n")
+
+@dataclasses.dataclass(slots=True)
+class PyKernel:
+    value_function  : typing.Callable[[float], float]
+    forward_function: typing.Callable[[float], Dual]
+
+    def __call__(self, x: float) -> float:
+        return self.value_function(x)
+
+    def forward(self, x: float) -> Dual:
+        return self.forward_function(x)
+
+def _load_code(name: str) -> types.CodeType|None:
+    try:
+        with open(cache.path(name), "rb") as f:
+            code = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return code if isinstance(code, types.CodeType) else None
+
+def compile_py(program: Program) -> PyKernel:
+    namespace = {"sin": math.sin, "cos": math.cos, "sqrt": math.sqrt,
+                 "inf": math.inf, "nan": math.nan, "Dual": Dual}
+    for i, call in enumerate(program.calls):
+        namespace[f"c{i}"], namespace[f"dc{i}"] = call.fn, call.derivative
+    # Expressions with Call nodes depend on live Python objects and are not
+    # persisted; the others reuse the code object marshalled on disk.
+    name = None if program.calls else cache.key(program, "python") + ".code"
+    code = _load_code(name) if name else None
+    if code is None:
+        code = compile(codegen_py(program), "<differential>", "exec")
+        if name:
+            try:
+                cache.store(name, marshal.dumps(code))
+            except OSError:
+                pass
+    exec(code, namespace)
+    return PyKernel(value_function=namespace["value"], forward_function=namespace["forward"])
+
+@dataclasses.dataclass(slots=True)
+class CKernel:
+    library : ctypes.CDLL
+    function: typing.Callable[..., float]
+
+    def __call__(self, x: float) -> float:
+        return self.function(x, ctypes.byref(ctypes.c_double()))
+
+    def forward(self, x: float) -> Dual:
+        derivative = ctypes.c_double()
+        value = self.function(x, ctypes.byref(derivative))
+        return Dual(value, derivative.value)
+
+def _build(program: Program) -> str:
+    library = cache.path(cache.key(program, "c") + ".so")
+    if os.path.exists(library):
+        return library
+    source = codegen_c(program)
+    directory = cache.cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as work:
+        path = os.path.join(work, "kernel.c")
+        with open(path, "w") as f:
+            f.write(source)
+        # -fno-math-errno lets sqrt be inlined; -ffast-math is avoided since it
+        # assumes no nan/inf, which sqrt and / produce outside their domain.
+        built = os.path.join(work, "kernel.so")
+        compiler = os.environ.get("CC", "cc")
+        subprocess.run([compiler, "-O3", "-fno-math-errno", "-shared", "-fPIC", "-o", built, path, "-lm"],
+                       check=True, capture_output=True)
+        # Atomic, so that concurrent processes never load a partial library.
+        os.replace(built, library)
+    return library
+
+def compile_c(program: Program) -> CKernel|Program:
+    # Falls back to the bytecode program when the expression cannot be
+    # translated or when no working C compiler is available.
+    if program.calls:
+        return program
+    try:
+        library = ctypes.CDLL(_build(program))
+    except (OSError, subprocess.CalledProcessError):
+        return program
+    function = library.forward
+    function.restype  = ctypes.c_double
+    function.argtypes = [ctypes.c_double, ctypes.POINTER(ctypes.c_double)]
+    return CKernel(library=library, function=function)
@@ -0,0 +1,446 @@
+import array, dataclasses, math, typing
+from math import cos as _cos, sin as _sin, sqrt as _sqrt
+
+LOAD_X, LOAD_CONST, CALL, ADD, SUB, MUL, DIV, NEG, SIN, COS, SQRT = range(11)
+
+class Dual(typing.NamedTuple):
+    v: float
+    d: float
+
+class Node:
+    __slots__ = ()
+    opcode: typing.ClassVar[int]
+
+    def children(self) -> tuple["Node", ...]:
+        return ()
+
+    @property
+    def program(self) -> "Program":
+        if self._program is None:
+            self._program = compile(self)
+        return self._program
+
+    def __call__(self, x: float) -> float:
+        return self.program(x)
+
+    def forward(self, x: float) -> Dual:
+        return self.program.forward(x)
+
+@dataclasses.dataclass(eq=False, slots=True)
+class Const(Node):
+    opcode = LOAD_CONST
+    k       : float
+    _program: typing.Any = dataclasses.field(default=None, init=False, repr=False)
+
+@dataclasses.dataclass(eq=False, slots=True)
+class Var(Node):
+    opcode = LOAD_X
+    _program: typing.Any = dataclasses.field(default=None, init=False, repr=False)
+
+@dataclasses.dataclass(eq=False, slots=True)
+class Call(Node):
+    opcode = CALL
+    fn        : typing.Callable[[float], float]
+    derivative: typing.Callable[[float], float]
+    _program  : typing.Any = dataclasses.field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.derivative is None:
+            raise TypeError("a callable value requires its derivative")
+
+@dataclasses.dataclass(eq=False, slots=True)
+class _Unary(Node):
+    operand : Node
+    _program: typing.Any = dataclasses.field(default=None, init=False, repr=False)
+
+    def children(self) -> tuple[Node, ...]:
+        return (self.operand,)
+
+@dataclasses.dataclass(eq=False, slots=True)
+class _Binary(Node):
+    left    : Node
+    right   : Node
+    _program: typing.Any = dataclasses.field(default=None, init=False, repr=False)
+
+    def children(self) -> tuple[Node, ...]:
+        return (self.left, self.right)
+
+class Add(_Binary):
+    __slots__ = ()
+    opcode = ADD
+
+class Sub(_Binary):
+    __slots__ = ()
+    opcode = SUB
+
+class Mul(_Binary):
+    __slots__ = ()
+    opcode = MUL
+
+class Div(_Binary):
+    __slots__ = ()
+    opcode = DIV
+
+class Neg(_Unary):
+    __slots__ = ()
+    opcode = NEG
+
+class Sin(_Unary):
+    __slots__ = ()
+    opcode = SIN
+
+class Cos(_Unary):
+    __slots__ = ()
+    opcode = COS
+
+class Sqrt(_Unary):
+    __slots__ = ()
+    opcode = SQRT
+
+def _is_const(node: Node, k: float|None = None) -> bool:
+    return isinstance(node, Const) and (k is None or node.k == k)
+
+def _slope(node: Node) -> float|None:
+    if isinstance(node, Var):
+        return 1.0
+    if isinstance(node, Mul) and _is_const(node.left) and isinstance(node.right, Var):
+        return node.left.k
+    return None
+
+def _affine(node: Node) -> tuple[float, float]|None:
+    # Coefficients (a, b) of a node spelling a * x + b, as built by
+    # _affine_node(). Only those shapes are matched, so that arbitrary subtrees
+    # are never walked.
+    if isinstance(node, Const):
+        return 0.0, node.k
+    if isinstance(node, Add) and _is_const(node.right):
+        a = _slope(node.left)
+        return None if a is None else (a, node.right.k)
+    a = _slope(node)
+    return None if a is None else (a, 0.0)
+
+def _affine_node(a: float, b: float) -> Node:
+    if a == 0:
+        return Const(b)
+    slope = Var() if a == 1 else Mul(Const(a), Var())
+    return slope if b == 0 else Add(slope, Const(b))
+
+def _fold(a: float, b: float) -> Node|None:
+    # Coefficients that overflowed (or were infinite already) are not folded,
+    # since inf * x and inf * 0 give inf and nan where the operands do not.
+    return _affine_node(a, b) if math.isfinite(a) and math.isfinite(b) else None
+
+def _power_of_two(k: float) -> bool:
+    return k != 0 and math.isfinite(k) and abs(math.frexp(k)[0]) == 0.5
+
+def _scaled(p: float, y: float) -> float|None:
+    # p * y for a power of two p, or None when the product over- or underflows
+    # and is therefore not exact.
+    z = p * y
+    return z if math.isfinite(z) and z / p == y else None
+
+def _sum(l: tuple[float, float], r: tuple[float, float]) -> Node|None:
+    # The affine sums evaluated exactly like their operands: a constant added
+    # to a term without one, and a term doubled.
+    (a, b), (c, d) = l, r
+    if b == 0 and c == 0:
+        return _fold(a, d)
+    if a == 0 and d == 0:
+        return _fold(c, b)
+    if b == d == 0 and a == c:
+        return _fold(2.0 * a, 0.0)
+    return None
+
+def _product(k: float, a: float, b: float) -> Node|None:
+    # k * (a * x + b) when the scaling commutes with the rounding: k is a power
+    # of two, or the term has no constant and a is a power of two.
+    if _power_of_two(k):
+        ka, kb = _scaled(k, a), _scaled(k, b)
+        return None if ka is None or kb is None else _affine_node(ka, kb)
+    if b == 0 and _power_of_two(a):
+        ka = _scaled(a, k)
+        return None if ka is None else _affine_node(ka, 0.0)
+    return None
+
+# Node constructors folding constant operands at construction time. Constants
+# and affine functions a * x + b are combined into a single affine node only
+# when it evaluates exactly like the operands, barring overflow and underflow
+# of intermediate results: constants are added to terms without one, terms are
+# negated, doubled, and scaled or divided by powers of two. Other combinations
+# would round differently and are built as they are. Folds that would raise
+# (division by zero, sqrt of a negative number, sin or cos of an infinity) are
+# left to the evaluation, where they are reported.
+
+def add(left: Node, right: Node) -> Node:
+    l, r = _affine(left), _affine(right)
+    if l and r:
+        if l[0] == r[0] == 0:
+            return Const(l[1] + r[1])
+        node = _sum(l, r)
+        if node:
+            return node
+    if _is_const(right, 0):
+        return left
+    if _is_const(left, 0):
+        return right
+    return Add(left, right)
+
+def sub(left: Node, right: Node) -> Node:
+    l, r = _affine(left), _affine(right)
+    if l and r:
+        if l[0] == r[0] == 0:
+            return Const(l[1] - r[1])
+        node = _sum(l, (-r[0], -r[1]))
+        if node:
+            return node
+    if _is_const(right, 0):
+        return left
+    if _is_const(left, 0):
+        return neg(right)
+    return Sub(left, right)
+
+def mul(left: Node, right: Node) -> Node:
+    l, r = _affine(left), _affine(right)
+    if l and r and (l[0] == 0 or r[0] == 0):
+        # One side is a constant, so the product stays affine.
+        k, (a, b) = (l[1], r) if l[0] == 0 else (r[1], l)
+        if a == 0:
+            return Const(k * b)
+        node = _product(k, a, b)
+        if node:
+            return node
+    # Only an affine factor with finite coefficients is dropped by a zero: any
+    # other operand may raise or give inf/nan, which the product must keep.
+    if _is_const(left, 0) and r and math.isfinite(r[0]) and math.isfinite(r[1]) or \
+       _is_const(right, 0) and l and math.isfinite(l[0]) and math.isfinite(l[1]):
+        return Const(0.0)
+    if _is_const(right, 1):
+        return left
+    if _is_const(left, 1):
+        return right
+    return Mul(left, right)
+
+def div(left: Node, right: Node) -> Node:
+    l = _affine(left)
+    if l and _is_const(right) and right.k != 0:
+        if l[0] == 0:
+            return Const(l[1] / right.k)
+        # Dividing by a power of two is scaling by its exact reciprocal.
+        node = _product(1.0 / right.k, *l) if _power_of_two(right.k) else None
+        if node:
+            return node
+    if _is_const(right, 1):
+        return left
+    return Div(left, right)
+
+def neg(operand: Node) -> Node:
+    a = _affine(operand)
+    if a:
+        return _affine_node(-a[0], -a[1])
+    return Neg(operand)
+
+def sin(operand: Node) -> Node:
+    if _is_const(operand) and math.isfinite(operand.k):
+        return Const(_sin(operand.k))
+    return Sin(operand)
+
+def cos(operand: Node) -> Node:
+    if _is_const(operand) and math.isfinite(operand.k):
+        return Const(_cos(operand.k))
+    return Cos(operand)
+
+def sqrt(operand: Node) -> Node:
+    if _is_const(operand) and operand.k >= 0:
+        return Const(_sqrt(operand.k))
+    return Sqrt(operand)
+
+def as_node(f: Node|typing.Callable[[float], float], derivative: typing.Callable[[float], float]|None = None) -> Node:
+    return f if isinstance(f, Node) else Call(f, derivative)
+
+@dataclasses.dataclass(slots=True)
+class Program:
+    # Struct of arrays over the nodes of the expression DAG, in topological
+    # order: entry i applies opcodes[i] to the results of the earlier entries
+    # left[i] and right[i], or reads consts[args[i]] / calls[args[i]] for a
+    # leaf. The last entry is the root.
+    opcodes: array.array
+    left   : array.array
+    right  : array.array
+    args   : array.array
+    consts : list[float]
+    calls  : list[Call]
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __call__(self, x: float) -> float:
+        return run(self, x)
+
+    def forward(self, x: float) -> Dual:
+        return run_dual(self, x)
+
+def _payload(node: Node) -> typing.Any:
+    if isinstance(node, Const):
+        # copysign keeps 0.0 and -0.0 apart, they compare equal otherwise.
+        return node.k, math.copysign(1.0, node.k)
+    if isinstance(node, Call):
+        return node.fn, node.derivative
+    return None
+
+def compile(expr: Node) -> Program:
+    # Hash-consing: structurally equal subtrees collapse into a single entry,
+    # so every common subexpression is computed once.
+    opcodes, left, right, args = array.array("B"), array.array("i"), array.array("i"), array.array("i")
+    consts, calls = [], []
+    ids, seen = {}, {}
+    # Post-order traversal with an explicit stack, so that long chains of
+    # operators do not hit the recursion limit.
+    todo = [(expr, False)]
+    while todo:
+        node, expanded = todo.pop()
+        if id(node) in seen:
+            continue
+        children = node.children()
+        if children and not expanded:
+            todo.append((node, True))
+            todo.extend((child, False) for child in reversed(children))
+            continue
+        operands = tuple(seen[id(child)] for child in children)
+        key = (node.opcode, _payload(node), operands)
+        if key not in ids:
+            arg = 0
+            if isinstance(node, Const):
+                arg = len(consts)
+                consts.append(node.k)
+            elif isinstance(node, Call):
+                arg = len(calls)
+                calls.append(node)
+            ids[key] = len(opcodes)
+            opcodes.append(node.opcode)
+            left.append(operands[0] if operands else 0)
+            right.append(operands[1] if len(operands) > 1 else 0)
+            args.append(arg)
+        seen[id(node)] = ids[key]
+    return Program(opcodes=opcodes, left=left, right=right, args=args, consts=consts, calls=calls)
+
+@dataclasses.dataclass(slots=True)
+class Tape:
+    opcodes: array.array
+    left   : array.array
+    right  : array.array
+    args   : array.array
+    offsets: array.array
+    consts : list[float]
+    calls  : list[Call]
+    width  : int
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def segment(self, i: int) -> Program:
+        # Operands are relative to the start of their segment and arguments
+        # index the shared pools, so a slice of the tape is a valid program.
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return Program(opcodes=self.opcodes[start:stop], left=self.left[start:stop],
+                       right=self.right[start:stop], args=self.args[start:stop],
+                       consts=self.consts, calls=self.calls)
+
+def pack(exprs: typing.Iterable[Node]) -> Tape:
+    # Concatenates the programs of several expressions into one tape, so that
+    # they can be evaluated independently from a single set of arrays;
+    # constants and calls go to shared pools.
+    opcodes, left, right, args = array.array("B"), array.array("i"), array.array("i"), array.array("i")
+    offsets = array.array("i", [0])
+    consts, calls = [], []
+    width = 0
+    for expr in exprs:
+        program = expr.program
+        for op, arg in zip(program.opcodes, program.args):
+            if op == LOAD_CONST:
+                arg += len(consts)
+            elif op == CALL:
+                arg += len(calls)
+            args.append(arg)
+        opcodes.extend(program.opcodes)
+        left.extend(program.left)
+        right.extend(program.right)
+        consts.extend(program.consts)
+        calls.extend(program.calls)
+        offsets.append(len(opcodes))
+        width = max(width, len(program))
+    return Tape(opcodes=opcodes, left=left, right=right, args=args, offsets=offsets,
+                consts=consts, calls=calls, width=width)
+
+def run(program: Program, x: float,
+        sin=_sin, cos=_cos, sqrt=_sqrt) -> float:
+    # The math functions are bound as default arguments so that the loop reads
+    # them as fast locals rather than as globals.
+    consts, calls = program.consts, program.calls
+    vals = [0.0] * len(program)
+    for i, op, l, r, arg in zip(range(len(vals)), program.opcodes, program.left, program.right, program.args):
+        if op == LOAD_X:
+            vals[i] = x
+        elif op == LOAD_CONST:
+            vals[i] = consts[arg]
+        elif op == CALL:
+            vals[i] = calls[arg].fn(x)
+        elif op == ADD:
+            vals[i] = vals[l] + vals[r]
+        elif op == SUB:
+            vals[i] = vals[l] - vals[r]
+        elif op == MUL:
+            vals[i] = vals[l] * vals[r]
+        elif op == DIV:
+            vals[i] = vals[l] / vals[r]
+        elif op == NEG:
+            vals[i] = -vals[l]
+        elif op == SIN:
+            vals[i] = sin(vals[l])
+        elif op == COS:
+            vals[i] = cos(vals[l])
+        elif op == SQRT:
+            vals[i] = sqrt(vals[l])
+    return vals[-1]
+
+def run_dual(program: Program, x: float,
+             sin=_sin, cos=_cos, sqrt=_sqrt) -> Dual:
+    # Forward-mode sweep: every entry computes its value and its derivative
+    # together, so no subtree is evaluated twice. The math functions are bound
+    # as fast locals, as in run().
+    consts, calls = program.consts, program.calls
+    vals = [0.0] * len(program)
+    ders = [0.0] * len(program)
+    for i, op, l, r, arg in zip(range(len(vals)), program.opcodes, program.left, program.right, program.args):
+        if op == LOAD_X:
+            vals[i], ders[i] = x, 1.0
+        elif op == LOAD_CONST:
+            vals[i], ders[i] = consts[arg], 0.0
+        elif op == CALL:
+            vals[i], ders[i] = calls[arg].fn(x), calls[arg].derivative(x)
+        elif op == ADD:
+            vals[i] = vals[l] + vals[r]
+            ders[i] = ders[l] + ders[r]
+        elif op == SUB:
+            vals[i] = vals[l] - vals[r]
+            ders[i] = ders[l] - ders[r]
+        elif op == MUL:
+            a, b = vals[l], vals[r]
+            vals[i] = a * b
+            ders[i] = a * ders[r] + ders[l] * b
+        elif op == DIV:
+            # (a/b)' = (a' b - b' a) / b^2 = (a' - (a/b) b') / b, reusing a/b.
+            b = vals[r]
+            q = vals[i] = vals[l] / b
+            ders[i] = (ders[l] - q * ders[r]) / b
+        elif op == NEG:
+            vals[i], ders[i] = -vals[l], -ders[l]
+        elif op == SIN:
+            v = vals[l]
+            vals[i], ders[i] = sin(v), cos(v) * ders[l]
+        elif op == COS:
+            v = vals[l]
+            vals[i], ders[i] = cos(v), -sin(v) * ders[l]
+        elif op == SQRT:
+            s = sqrt(vals[l])
+            vals[i], ders[i] = s, 0.5 * ders[l] / s
+    return Dual(vals[-1], ders[-1])
@@ -1,26 +1,30 @@
-import math
+import functools, math
 
+from . import expression
 from .differentiable import Differentiable
 
 def Sqrt(f: Differentiable) -> Differentiable:
-    value = lambda x: math.sqrt(f.value(x))
-    derivative = lambda x: 0.5 * f.derivative(x) / math.sqrt(f.value(x))
-    return Differentiable(value=value, derivative=derivative)
+    return Differentiable(expression.sqrt(f.expr))
 
 def Cos(f: Differentiable) -> Differentiable:
-    value = lambda x: math.cos(f.value(x))
-    derivative = lambda x: -math.sin(f.value(x)) * f.derivative(x)
-    return Differentiable(value=value, derivative=derivative)
+    return Differentiable(expression.cos(f.expr))
 
 def Sin(f: Differentiable) -> Differentiable:
-    value = lambda x: math.sin(f.value(x))
-    derivative = lambda x: math.cos(f.value(x)) * f.derivative(x)
-    return Differentiable(value=value, derivative=derivative)
+    return Differentiable(expression.sin(f.expr))
+
+# Differentiable objects are frozen, so Constant and Linear share one
+# instance per coefficient. The sign is part of the key since 0.0 == -0.0.
+
+@functools.lru_cache(maxsize=1024, typed=True)
+def _constant(k: float, sign: float) -> Differentiable:
+    return Differentiable(expression.Const(k))
+
+@functools.lru_cache(maxsize=1024, typed=True)
+def _linear(k: float, sign: float) -> Differentiable:
+    return Differentiable(expression.mul(expression.Const(k), expression.Var()))
 
 def Constant(k: float) -> Differentiable:
-    value, derivative= lambda _: k, lambda _: 0
-    return Differentiable(value=value, derivative=derivative)
+    return _constant(k, math.copysign(1.0, k))
 
 def Linear(k: float) -> Differentiable:
-    value, derivative= lambda x: k * x, lambda _: k
-    return Differentiable(value=value, derivative=derivative)
\ No newline at end of file
+    return _linear(k, math.copysign(1.0, k))
\ No newline at end of file
@@ -0,0 +1,99 @@
+import typing
+
+from .expression import (Program, Tape, LOAD_X, LOAD_CONST, ADD, SUB, MUL, DIV, NEG,
+                         SIN, COS, SQRT)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+if numba is not None:
+    # error_model="numpy" follows IEEE semantics (inf/nan) instead of raising,
+    # which is what a batch of points expects.
+    @numba.njit(numba.float64(numba.uint8[::1], numba.int32[::1], numba.int32[::1], numba.int32[::1],
+                              numba.float64[::1], numba.float64[::1], numba.float64),
+                cache=True, error_model="numpy")
+    def eval_code(opcodes, left, right, args, consts, vals, x):
+        n = opcodes.size
+        for i in range(n):
+            op, l, r = opcodes[i], left[i], right[i]
+            if op == LOAD_X:
+                vals[i] = x
+            elif op == LOAD_CONST:
+                vals[i] = consts[args[i]]
+            elif op == ADD:
+                vals[i] = vals[l] + vals[r]
+            elif op == SUB:
+                vals[i] = vals[l] - vals[r]
+            elif op == MUL:
+                vals[i] = vals[l] * vals[r]
+            elif op == DIV:
+                vals[i] = vals[l] / vals[r]
+            elif op == NEG:
+                vals[i] = -vals[l]
+            elif op == SIN:
+                vals[i] = np.sin(vals[l])
+            elif op == COS:
+                vals[i] = np.cos(vals[l])
+            elif op == SQRT:
+                vals[i] = np.sqrt(vals[l])
+        return vals[n - 1]
+
+    @numba.njit(parallel=True, cache=True, error_model="numpy")
+    def _value_batch(opcodes, left, right, args, consts, chunks, xs):
+        out = np.empty(xs.size)
+        # One array of intermediates per chunk, rather than one per point.
+        size = (xs.size + chunks - 1) // chunks
+        for c in numba.prange(chunks):
+            vals = np.empty(opcodes.size)
+            for i in range(c * size, min(xs.size, (c + 1) * size)):
+                out[i] = eval_code(opcodes, left, right, args, consts, vals, xs[i])
+        return out
+
+    @numba.njit(parallel=True, cache=True, error_model="numpy")
+    def _value_many(opcodes, left, right, args, offsets, consts, width, chunks, x):
+        n = offsets.size - 1
+        out = np.empty(n)
+        size = (n + chunks - 1) // chunks
+        for c in numba.prange(chunks):
+            vals = np.empty(width)
+            for i in range(c * size, min(n, (c + 1) * size)):
+                start, stop = offsets[i], offsets[i + 1]
+                out[i] = eval_code(opcodes[start:stop], left[start:stop], right[start:stop],
+                                   args[start:stop], consts, vals, x)
+        return out
+
+def _arrays(program: Program|Tape) -> tuple[typing.Any, ...]:
+    opcodes = np.frombuffer(program.opcodes, dtype=np.uint8)
+    left, right, args = (np.frombuffer(a, dtype=a.typecode).astype(np.int32, copy=False)
+                         for a in (program.left, program.right, program.args))
+    consts = np.array(program.consts, dtype=np.float64)
+    return opcodes, left, right, args, consts
+
+def value_batch(program: Program, xs: typing.Any) -> typing.Any:
+    if np is None:
+        raise ImportError("value_batch requires numpy")
+    xs = np.asarray(xs, dtype=np.float64)
+    # Call leaves wrap arbitrary Python callables, which numba cannot run.
+    if numba is None or program.calls:
+        return np.array([program(x) for x in xs.ravel()], dtype=np.float64).reshape(xs.shape)
+    out = _value_batch(*_arrays(program), numba.get_num_threads(), np.ascontiguousarray(xs.ravel()))
+    return out.reshape(xs.shape)
+
+def value_many(tape: Tape, x: float) -> typing.Any:
+    # Evaluates every expression of a packed tape at the same point, returning
+    # the values as one contiguous array.
+    if np is None:
+        raise ImportError("value_many requires numpy")
+    if numba is None or tape.calls:
+        return np.array([tape.segment(i)(x) for i in range(len(tape))], dtype=np.float64)
+    opcodes, left, right, args, consts = _arrays(tape)
+    offsets = np.frombuffer(tape.offsets, dtype=tape.offsets.typecode).astype(np.int64)
+    return _value_many(opcodes, left, right, args, offsets, consts, tape.width,
+                       numba.get_num_threads(), float(x))
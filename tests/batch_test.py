@@ -0,0 +1,31 @@
+import math
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from differential import Differentiable, Sqrt, Sin, Cos, Constant, Linear
+
+def test_batch_matches_scalar_forward():
+    f = Sqrt(Sin(Linear(1.0)) * Sin(Linear(1.0)) + 1.0) / (Cos(Linear(2.0)) + 3.0)
+    xs = np.linspace(-3.0, 3.0, 101)
+    v, d = f.batch(xs)
+    np.testing.assert_allclose(v, [f.value(x) for x in xs])
+    np.testing.assert_allclose(d, [f.derivative(x) for x in xs])
+
+def test_batch_of_constant_has_input_shape():
+    v, d = Constant(2.5).batch(np.arange(4.0))
+    np.testing.assert_allclose(v, [2.5] * 4)
+    np.testing.assert_allclose(d, [0.0] * 4)
+
+def test_batch_applies_python_callables_pointwise():
+    f = Differentiable(value=lambda x: math.exp(x), derivative=lambda x: math.exp(x)) * Linear(1.0)
+    xs = np.array([0.0, 1.0, 2.0])
+    v, d = f.batch(xs)
+    np.testing.assert_allclose(v, xs * np.exp(xs))
+    np.testing.assert_allclose(d, (1.0 + xs) * np.exp(xs))
+
+def test_batch_returns_nan_outside_domain():
+    v, d = Sqrt(Linear(1.0)).batch([-1.0, 0.0, 4.0])
+    assert math.isnan(v[0])
+    assert math.isinf(d[1])
+    assert (v[2], d[2]) == (pytest.approx(2.0), pytest.approx(0.25))
@@ -0,0 +1,117 @@
+import math
+import shutil
+import pytest
+
+from differential import Differentiable, Sqrt, Sin, Cos, Constant, Linear, cache, codegen, expression
+
+needs_cc = pytest.mark.skipif(shutil.which("cc") is None, reason="no C compiler")
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return tmp_path
+
+def test_codegen_c_reuses_shared_subexpressions():
+    f = Sin(Linear(2.0) + 1.0) * Cos(Linear(2.0) + 1.0)
+    source = codegen.codegen_c(f.expr.program)
+    assert source.count(" + 0x1.0000000000000p+0;") == 1
+
+def test_codegen_c_rejects_call_nodes():
+    f = Differentiable(value=math.exp, derivative=math.exp)
+    with pytest.raises(ValueError):
+        codegen.codegen_c(f.expr.program)
+
+@needs_cc
+@pytest.mark.parametrize("x", [-1.5, 0.25, 2.0])
+def test_c_kernel_matches_bytecode(x):
+    f = Sqrt(Sin(Linear(1.0)) * Sin(Linear(1.0)) + 1.0) / (Cos(Linear(2.0)) - 3.0) - Linear(-0.5)
+    kernel = f.compile("c")
+    assert isinstance(kernel, codegen.CKernel)
+    v, d = kernel.forward(x)
+    assert v == pytest.approx(f.value(x))
+    assert d == pytest.approx(f.derivative(x))
+    assert kernel(x) == pytest.approx(f.value(x))
+
+@needs_cc
+def test_c_kernel_is_cached_by_expression(cache_home):
+    Linear(3.0).compile("c")
+    Linear(3.0).compile("c")
+    assert len(list((cache_home / "differential").glob("*.so"))) == 1
+
+def test_compile_c_falls_back_to_bytecode_for_call_nodes():
+    f = Differentiable(value=math.exp, derivative=math.exp)
+    assert isinstance(f.compile("c"), expression.Program)
+
+def test_compile_c_falls_back_without_compiler(monkeypatch):
+    monkeypatch.setenv("CC", "/nonexistent/cc")
+    kernel = (Linear(2.0) + 1.0).compile("c")
+    assert isinstance(kernel, expression.Program)
+    assert kernel.forward(1.0) == (3.0, 2.0)
+
+@pytest.mark.parametrize("x", [-1.5, 0.25, 2.0])
+def test_python_kernel_matches_bytecode(x):
+    f = Sqrt(Sin(Linear(1.0)) * Sin(Linear(1.0)) + 1.0) / (Cos(Linear(2.0)) - 3.0) - Linear(-0.5)
+    kernel = f.compile("python")
+    assert isinstance(kernel, codegen.PyKernel)
+    assert kernel(x) == pytest.approx(f.value(x))
+    v, d = kernel.forward(x)
+    assert v == pytest.approx(f.value(x))
+    assert d == pytest.approx(f.derivative(x))
+
+def test_python_kernel_supports_call_nodes():
+    f = Differentiable(value=math.exp, derivative=math.exp) * Linear(2.0)
+    v, d = f.compile("python").forward(1.0)
+    assert v == pytest.approx(2.0 * math.e)
+    assert d == pytest.approx(4.0 * math.e)
+
+def test_python_kernel_raises_like_bytecode():
+    f = Sqrt(Linear(1.0) * Linear(1.0))
+    kernel = f.compile("python")
+    assert kernel(0.0) == pytest.approx(0.0)
+    with pytest.raises(ZeroDivisionError):
+        kernel.forward(0.0)
+    with pytest.raises(ValueError):
+        Sqrt(Constant(-1.0)).compile("python")(0.0)
+
+def test_codegen_py_simplifies_unit_derivatives():
+    source = codegen.codegen_py((Linear(2.0) + 1.0).expr.program)
+    assert "1.0 *" not in source and "0.0 *" not in source
+
+def test_compile_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        Linear(1.0).compile("fortran")
+
+@needs_cc
+def test_c_kernel_is_loaded_from_cache_without_compiling(cache_home, monkeypatch):
+    f = Sin(Linear(2.0)) + 1.0
+    f.compile("c")
+    monkeypatch.setenv("CC", "/nonexistent/cc")
+    assert isinstance((Sin(Linear(2.0)) + 1.0).compile("c"), codegen.CKernel)
+
+def test_python_kernel_is_persisted_and_reloaded(cache_home, monkeypatch):
+    f = Sqrt(Linear(3.0) + 1.0)
+    f.compile("python")
+    assert len(list((cache_home / "differential").glob("*.code"))) == 1
+    monkeypatch.setattr(codegen, "codegen_py", None)
+    kernel = Sqrt(Linear(3.0) + 1.0).compile("python")
+    assert kernel.forward(1.0) == (pytest.approx(2.0), pytest.approx(0.75))
+
+def test_python_kernel_recovers_from_corrupt_cache(cache_home):
+    f = Cos(Linear(1.0))
+    name = cache.key(f.expr.program, "python") + ".code"
+    (cache_home / "differential").mkdir()
+    (cache_home / "differential" / name).write_bytes(b"garbage")
+    assert f.compile("python")(0.0) == pytest.approx(1.0)
+
+def test_python_kernel_with_call_nodes_is_not_persisted(cache_home):
+    (Differentiable(value=math.exp, derivative=math.exp) + 1.0).compile("python")
+    assert not (cache_home / "differential").exists()
+
+def test_cache_key_depends_on_expression_backend_and_version(monkeypatch):
+    program = (Linear(2.0) + 1.0).expr.program
+    assert cache.key(program, "c") == cache.key((Linear(2.0) + 1.0).expr.program, "c")
+    assert cache.key(program, "c") != cache.key((Linear(2.0) - 1.0).expr.program, "c")
+    assert cache.key(program, "c") != cache.key(program, "python")
+    key = cache.key(program, "c")
+    monkeypatch.setattr(cache, "VERSION", "0.0.0-other")
+    assert cache.key(program, "c") != key
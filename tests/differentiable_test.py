@@ -1,3 +1,4 @@
+import math
 import pytest
 
 from differential import Differentiable, Linear, Constant
@@ -116,11 +117,45 @@ def test_true_div_raises_on_zero_division_at_eval():
     with pytest.raises(ZeroDivisionError):
         _ = h.value(1.0)  # dénominateur nul
 
-def test_visitable_call_invokes_visit_once():
-    class Spy:
-        def __init__(self): self.calls = 0; self.arg = None
-        def visit(self, x): self.calls += 1; self.arg = x; return "ok"
+def test_forward_matches_value_and_derivative():
+    h = Linear(3.0) * Linear(2.0) + 1.0   # 6x^2 + 1
+    dual = h.forward(2.0)
+    assert dual == (h.value(2.0), h.derivative(2.0))
+    assert dual.v == pytest.approx(25.0)
+    assert dual.d == pytest.approx(24.0)
 
-    f = Differentiable(value=lambda x: 2*x, derivative=lambda _: 2.0)
-    out = f(Spy())
-    assert out == "ok"
\ No newline at end of file
+def test_operators_accept_int_constants():
+    f = Linear(2.0)
+    h = 3 * f + 1 - (2 - f)   # 8x - 1
+    v, d = eval_pair(h, 2.0)
+    assert v == pytest.approx(15.0)
+    assert d == pytest.approx(8.0)
+
+def test_true_div_by_float():
+    h = Linear(6.0) / 3.0
+    v, d = eval_pair(h, 5.0)
+    assert v == pytest.approx(10.0)
+    assert d == pytest.approx(2.0)
+
+def test_true_div_by_float_is_correctly_rounded():
+    assert (Linear(1.0) / 3.0).value(5.0) == 5.0 / 3.0
+
+def test_callable_requires_derivative():
+    with pytest.raises(TypeError):
+        Differentiable(value=math.exp)
+
+def test_differentiable_has_no_instance_dict():
+    assert not hasattr(Linear(1.0) + 1.0, "__dict__")
+
+@pytest.mark.parametrize("x", [0.5, 1.0, 3.0])
+def test_true_div_quotient_rule_on_non_linear_functions(x):
+    # f(x) = x^2 / (x + 1) => f'(x) = (x^2 + 2x) / (x + 1)^2
+    h = (Linear(1.0) * Linear(1.0)) / (Linear(1.0) + 1.0)
+    v, d = eval_pair(h, x)
+    assert v == pytest.approx(x * x / (x + 1))
+    assert d == pytest.approx((x * x + 2 * x) / (x + 1) ** 2)
+
+def test_true_div_derivative_raises_on_zero_division():
+    h = Constant(1.0) / Linear(1.0)
+    with pytest.raises(ZeroDivisionError):
+        _ = h.derivative(0.0)
@@ -0,0 +1,201 @@
+import math
+import pytest
+
+from differential import expression
+from differential.expression import Const, Var, Call, Add, Sub, Mul, Div, Neg, Sin, Cos, Sqrt
+
+def test_compile_lays_out_nodes_in_topological_order():
+    # 2*x + 1  =>  LOAD_CONST, LOAD_X, MUL(0, 1), LOAD_CONST, ADD(2, 3)
+    program = expression.compile(Add(Mul(Const(2.0), Var()), Const(1.0)))
+    assert list(program.opcodes) == [expression.LOAD_CONST, expression.LOAD_X, expression.MUL,
+                                     expression.LOAD_CONST, expression.ADD]
+    assert (program.left[2], program.right[2]) == (0, 1)
+    assert (program.left[4], program.right[4]) == (2, 3)
+    assert [program.args[0], program.args[3]] == [0, 1]
+    assert program.consts == [2.0, 1.0]
+
+@pytest.mark.parametrize("x", [-2.0, 0.5, 3.0])
+def test_program_matches_direct_evaluation(x):
+    expr = Div(Sub(Sin(Var()), Neg(Cos(Var()))), Sqrt(Add(Mul(Var(), Var()), Const(1.0))))
+    expected = (math.sin(x) + math.cos(x)) / math.sqrt(x * x + 1.0)
+    assert expr(x) == pytest.approx(expected)
+
+def test_call_leaf_invokes_wrapped_callable():
+    expr = Mul(Call(lambda x: x + 1.0, lambda _: 1.0), Const(3.0))
+    assert expr(2.0) == pytest.approx(9.0)
+
+def test_call_leaf_requires_derivative():
+    with pytest.raises(TypeError):
+        Call(abs)
+    with pytest.raises(TypeError):
+        Call(abs, None)
+
+def test_compile_handles_long_chains():
+    # une chaîne plus profonde que la limite de récursion ne doit pas lever
+    expr = Var()
+    for _ in range(5000):
+        expr = Add(expr, Const(1.0))
+    assert expr(0.0) == pytest.approx(5000.0)
+
+@pytest.mark.parametrize("x", [0.3, 1.0, 4.0])
+def test_forward_returns_value_and_derivative_in_one_sweep(x):
+    # f(x) = sqrt(x) * sin(x) => f'(x) = sin(x) / (2 sqrt(x)) + sqrt(x) cos(x)
+    v, d = Mul(Sqrt(Var()), Sin(Var())).forward(x)
+    assert v == pytest.approx(math.sqrt(x) * math.sin(x))
+    assert d == pytest.approx(math.sin(x) / (2 * math.sqrt(x)) + math.sqrt(x) * math.cos(x))
+
+def test_forward_uses_call_derivative():
+    expr = Cos(Call(lambda x: x * x, lambda x: 2 * x))
+    v, d = expr.forward(1.5)
+    assert v == pytest.approx(math.cos(2.25))
+    assert d == pytest.approx(-math.sin(2.25) * 3.0)
+
+def test_forward_evaluates_nested_sqrt_linearly():
+    calls = []
+    def f(x):
+        calls.append(x)
+        return x
+    expr = Call(f, lambda _: 1.0)
+    for _ in range(10):
+        expr = Sqrt(expr)
+    expr.forward(2.0)
+    assert len(calls) == 1
+
+def test_compile_emits_shared_subexpression_once():
+    # sin(x+1) * cos(x+1) : x+1 est construit deux fois mais calculé une seule
+    program = expression.compile(Mul(Sin(Add(Var(), Const(1.0))), Cos(Add(Var(), Const(1.0)))))
+    assert list(program.opcodes).count(expression.ADD) == 1
+    assert list(program.opcodes).count(expression.LOAD_X) == 1
+    assert program.consts == [1.0]
+    sin, cos = program.opcodes.index(expression.SIN), program.opcodes.index(expression.COS)
+    assert program.left[sin] == program.left[cos]
+
+def test_compile_shared_call_is_invoked_once():
+    calls = []
+    def f(x):
+        calls.append(x)
+        return x
+    leaf = Call(f, lambda _: 1.0)
+    v, d = Add(Sqrt(leaf), Sqrt(leaf)).forward(4.0)
+    assert (v, d) == (pytest.approx(4.0), pytest.approx(0.5))
+    assert len(calls) == 1
+
+def test_compile_keeps_signed_zeros_apart():
+    program = expression.compile(Add(Mul(Const(0.0), Var()), Mul(Const(-0.0), Var())))
+    assert [math.copysign(1.0, k) for k in program.consts] == [1.0, -1.0]
+
+def test_compile_traverses_shared_dag_once():
+    # 2^60 noeuds une fois déplié en arbre
+    expr = Add(Var(), Const(1.0))
+    for _ in range(60):
+        expr = Mul(expr, expr)
+    program = expression.compile(expr)
+    assert list(program.opcodes).count(expression.MUL) == 60
+
+@pytest.mark.parametrize("build, expected", [
+    (lambda: expression.add(Const(3.5), Const(2.0)), 5.5),
+    (lambda: expression.sub(Const(3.5), Const(2.0)), 1.5),
+    (lambda: expression.mul(Const(3.5), Const(2.0)), 7.0),
+    (lambda: expression.div(Const(3.0), Const(2.0)), 1.5),
+    (lambda: expression.neg(Const(2.0)), -2.0),
+    (lambda: expression.sqrt(Const(9.0)), 3.0),
+    (lambda: expression.sin(Const(0.0)), 0.0),
+    (lambda: expression.cos(Const(0.0)), 1.0),
+    (lambda: expression.mul(Var(), Const(0.0)), 0.0),
+])
+def test_constructors_fold_constant_operands(build, expected):
+    node = build()
+    assert isinstance(node, Const)
+    assert node.k == pytest.approx(expected)
+
+def test_constructors_drop_neutral_operands():
+    x = Sin(Var())
+    assert expression.add(x, Const(0.0)) is x
+    assert expression.add(Const(0.0), x) is x
+    assert expression.sub(x, Const(0.0)) is x
+    assert expression.mul(x, Const(1.0)) is x
+    assert expression.mul(Const(1.0), x) is x
+    assert expression.div(x, Const(1.0)) is x
+    assert isinstance(expression.sub(Const(0.0), x), Neg)
+
+@pytest.mark.parametrize("build, a, b", [
+    (lambda x: expression.add(expression.mul(Const(2.0), x), Const(3.0)), 2.0, 3.0),
+    (lambda x: expression.add(x, x), 2.0, 0.0),
+    (lambda x: expression.sub(Const(1.0), expression.mul(x, Const(4.0))), -4.0, 1.0),
+    (lambda x: expression.div(expression.add(x, Const(3.0)), Const(2.0)), 0.5, 1.5),
+    (lambda x: expression.neg(expression.add(x, Const(3.0))), -1.0, -3.0),
+    (lambda x: expression.mul(Const(2.0), expression.add(expression.mul(Const(3.0), x), Const(1.0))), 6.0, 2.0),
+])
+def test_constructors_collapse_affine_combinations(build, a, b):
+    node = build(Var())
+    assert expression._affine(node) == (pytest.approx(a), pytest.approx(b))
+    assert len(expression.compile(node)) <= 5
+
+@pytest.mark.parametrize("build", [
+    lambda x: expression.mul(Const(math.inf), x),
+    lambda x: expression.mul(x, Const(math.inf)),
+    lambda x: expression.mul(Const(math.inf), expression.add(x, Const(0.0))),
+])
+def test_constructors_do_not_distribute_infinite_factors(build):
+    # inf * 0 donnerait nan pour le terme constant nul
+    node = build(Var())
+    assert node(2.0) == math.inf
+    assert node.forward(2.0) == (math.inf, math.inf)
+
+@pytest.mark.parametrize("build", [
+    lambda x: expression.mul(expression.mul(Const(1e308), x), Const(10.0)),
+    lambda x: expression.add(expression.mul(Const(1e308), x), expression.mul(Const(1e308), x)),
+    lambda x: expression.sub(expression.mul(Const(1e308), x), expression.mul(Const(-1e308), x)),
+])
+def test_constructors_do_not_fold_overflowing_coefficients(build):
+    node = build(Var())
+    assert node(0.0) == 0.0
+    assert node.forward(0.0).v == 0.0
+
+def test_constructors_keep_division_by_inexact_reciprocal():
+    # x * (1/3) n'est pas correctement arrondi, contrairement à x / 3
+    node = expression.div(Var(), Const(3.0))
+    assert isinstance(node, Div)
+    assert node(5.0) == 5.0 / 3.0
+    assert expression.div(Const(5.0), Const(3.0)).k == 5.0 / 3.0
+
+@pytest.mark.parametrize("operand", [Sqrt(Var()), Div(Const(1.0), Var()), Mul(Const(math.inf), Var())])
+def test_constructors_keep_products_by_zero_of_non_affine_operands(operand):
+    # les erreurs et les nan/inf de l'opérande ne doivent pas disparaître
+    assert isinstance(expression.mul(operand, Const(0.0)), Mul)
+    assert isinstance(expression.mul(Const(0.0), operand), Mul)
+
+@pytest.mark.parametrize("node", [Var(), Const(2.0), Mul(Const(3.0), Var())])
+def test_affine_coefficients_are_floats(node):
+    assert all(type(c) is float for c in expression._affine(node))
+
+def test_constructors_keep_products_of_affine_functions():
+    x = Var()
+    assert isinstance(expression.mul(expression.add(x, Const(1.0)), x), Mul)
+    assert isinstance(expression.div(Const(1.0), x), Div)
+
+def test_constructors_leave_invalid_folds_to_evaluation():
+    # les erreurs de domaine doivent être levées à l'évaluation, pas à la construction
+    quotient = expression.div(Const(1.0), Const(0.0))
+    root = expression.sqrt(Const(-1.0))
+    sine, cosine = expression.sin(Const(math.inf)), expression.cos(Const(-math.inf))
+    assert isinstance(quotient, Div) and isinstance(root, Sqrt)
+    assert isinstance(sine, Sin) and isinstance(cosine, Cos)
+    with pytest.raises(ZeroDivisionError):
+        quotient(0.0)
+    for node in (root, sine, cosine):
+        with pytest.raises(ValueError):
+            node(0.0)
+
+@pytest.mark.parametrize("node", [Const(1.0), Var(), Call(abs, abs), Add(Var(), Var()), Sqrt(Var())])
+def test_nodes_have_no_instance_dict(node):
+    assert not hasattr(node, "__dict__")
+
+def test_pack_rebases_operands_onto_shared_pools():
+    exprs = [Add(Var(), Const(1.0)), Mul(Const(2.0), Call(abs, abs)), Sin(Var())]
+    tape = expression.pack(exprs)
+    assert list(tape.offsets) == [0, 3, 6, 8]
+    assert tape.consts == [1.0, 2.0]
+    assert tape.width == 3
+    for i, expr in enumerate(exprs):
+        assert tape.segment(i)(-0.5) == pytest.approx(expr(-0.5))
@@ -1,7 +1,7 @@
-import math
+import dataclasses, math
 import pytest
 
-from differential import Differentiable, Sqrt, Sin, Cos, Constant, Linear
+from differential import Differentiable, Sqrt, Sin, Cos, Constant, Linear, expression
 
 def eval_pair(f: Differentiable, x: float):
     """Retourne (f(x), f'(x))."""
@@ -233,4 +233,75 @@ def test_linear_derivative_matches_finite_difference():
     d_numeric = (f.value(x0 + eps) - f.value(x0 - eps)) / (2 * eps)
     assert d_numeric == pytest.approx(k, rel=1e-6, abs=1e-8)
     # et la dérivée analytique est k
-    assert f.derivative(x0) == pytest.approx(k)
\ No newline at end of file
+    assert f.derivative(x0) == pytest.approx(k)
+
+def test_constant_only_expression_folds_to_single_constant():
+    f = Sqrt(Constant(4.0) + Constant(2.0) * Constant(2.5))
+    assert isinstance(f.expr, expression.Const)
+    assert f.expr.k == pytest.approx(3.0)
+
+def test_shared_argument_is_evaluated_once_per_call():
+    # cos(f) * sin(f) : f n'est évaluée qu'une fois par appel de value/derivative
+    calls = {"value": 0, "derivative": 0}
+    def value(x):
+        calls["value"] += 1
+        return x * x
+    def derivative(x):
+        calls["derivative"] += 1
+        return 2 * x
+    f = Differentiable(value=value, derivative=derivative)
+    g = Cos(f) * Sin(f)
+    x = 0.7
+    v, d = eval_pair(g, x)
+    assert v == pytest.approx(math.cos(x * x) * math.sin(x * x))
+    assert d == pytest.approx(2 * x * math.cos(2 * x * x))
+    assert calls == {"value": 2, "derivative": 1}
+
+def test_polynomial_of_degree_one_builds_single_affine_node():
+    x = Linear(1.0)
+    f = 3.0 - 2.0 * (x + x) / 8.0   # 3 - 0.5x
+    assert list(f.expr.program.opcodes) == [expression.LOAD_CONST, expression.LOAD_X, expression.MUL,
+                                            expression.LOAD_CONST, expression.ADD]
+    v, d = eval_pair(f, 2.0)
+    assert v == pytest.approx(2.0)
+    assert d == pytest.approx(-0.5)
+
+@pytest.mark.parametrize("build, x, expected", [
+    (lambda x: (x + 1e16) - 1e16, 1.0, 0.0),
+    (lambda x: (x + 0.1) * 3.0, 0.2, (0.2 + 0.1) * 3.0),
+    (lambda x: Linear(0.1) + Linear(0.2), 3.0, 0.1 * 3.0 + 0.2 * 3.0),
+    (lambda x: Linear(1.0) / 3.0 + 1.0, 5.0, 5.0 / 3.0 + 1.0),
+])
+def test_folding_keeps_results_bit_exact(build, x, expected):
+    assert build(Linear(1.0)).value(x) == expected
+
+def test_constant_and_linear_are_shared_per_coefficient():
+    assert Constant(2.5) is Constant(2.5)
+    assert Linear(-1.0) is Linear(-1.0)
+    assert Constant(2.5) is not Constant(3.5)
+    assert Linear(2.0) is not Constant(2.0)
+
+def test_product_by_zero_keeps_evaluation_errors():
+    x = Linear(1.0)
+    with pytest.raises(ValueError):
+        (Sqrt(x) * 0.0).value(-1.0)
+    with pytest.raises(ZeroDivisionError):
+        ((Constant(1.0) / x) * 0.0).value(0.0)
+    assert isinstance((x * 0.0).expr, expression.Const)
+
+def test_linear_with_infinite_coefficient():
+    assert Linear(math.inf).value(2.0) == math.inf
+    assert (Linear(1.0) * math.inf).value(2.0) == math.inf
+    assert (Constant(math.inf) * Constant(2.0)).value(0.0) == math.inf
+    assert (Linear(1e308) * 10.0).value(0.0) == 0.0
+    assert (Linear(1e308) + Linear(1e308)).value(0.0) == 0.0
+
+def test_shared_instances_cannot_be_reassigned():
+    c = Constant(2.0)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        c.expr = expression.Var()
+    assert Constant(2.0).value(5.0) == pytest.approx(2.0)
+
+def test_constant_cache_keeps_signed_zeros_apart():
+    assert math.copysign(1.0, Constant(-0.0).value(0.0)) == -1.0
+    assert math.copysign(1.0, Constant(0.0).value(0.0)) == 1.0
@@ -0,0 +1,60 @@
+import math, subprocess, sys
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from differential import Differentiable, Sqrt, Sin, Cos, Linear, expression, jit
+
+def test_value_batch_matches_scalar_value():
+    f = Sqrt(Sin(Linear(1.0)) * Sin(Linear(1.0)) + 1.0) / (Cos(Linear(2.0)) + 3.0)
+    xs = np.linspace(-3.0, 3.0, 101)
+    expected = np.array([f.value(x) for x in xs])
+    np.testing.assert_allclose(f.value_batch(xs), expected)
+
+def test_value_batch_keeps_input_shape():
+    f = Linear(2.0) + 1.0
+    xs = np.arange(6.0).reshape(2, 3)
+    out = f.value_batch(xs)
+    assert out.shape == (2, 3)
+    np.testing.assert_allclose(out, 2.0 * xs + 1.0)
+
+def test_value_batch_returns_nan_outside_domain():
+    # contrairement à value(), un lot ne lève pas : sqrt(-1) donne nan
+    pytest.importorskip("numba")
+    f = Sqrt(Linear(1.0))
+    out = f.value_batch([-1.0, 4.0])
+    assert math.isnan(out[0])
+    assert out[1] == pytest.approx(2.0)
+
+def test_value_batch_falls_back_for_python_callables():
+    f = Differentiable(value=lambda x: x * x, derivative=lambda x: 2 * x) + 1.0
+    np.testing.assert_allclose(f.value_batch([1.0, 2.0, 3.0]), [2.0, 5.0, 10.0])
+
+def test_value_batch_without_numba(monkeypatch):
+    monkeypatch.setattr(jit, "numba", None)
+    f = Sin(Linear(1.0))
+    xs = np.linspace(0.0, 1.0, 5)
+    np.testing.assert_allclose(f.value_batch(xs), np.sin(xs))
+
+def test_value_many_evaluates_packed_expressions():
+    fs = [Sin(Linear(1.0)), Sqrt(Linear(2.0) + 1.0), Cos(Linear(1.0)) * Linear(3.0) - 2.0, Linear(0.0)]
+    tape = expression.pack(f.expr for f in fs)
+    assert len(tape) == len(fs)
+    out = jit.value_many(tape, 1.5)
+    np.testing.assert_allclose(out, [f.value(1.5) for f in fs])
+
+def test_value_many_falls_back_for_python_callables():
+    fs = [Differentiable(value=lambda x: x * x, derivative=lambda x: 2 * x) + 1.0, Sin(Linear(1.0))]
+    out = jit.value_many(expression.pack(f.expr for f in fs), 2.0)
+    np.testing.assert_allclose(out, [5.0, math.sin(2.0)])
+
+def test_value_many_without_numba(monkeypatch):
+    monkeypatch.setattr(jit, "numba", None)
+    fs = [Sin(Linear(1.0)), Cos(Linear(1.0)) + 2.0]
+    out = jit.value_many(expression.pack(f.expr for f in fs), 0.5)
+    np.testing.assert_allclose(out, [math.sin(0.5), math.cos(0.5) + 2.0])
+
+def test_package_import_does_not_load_numba():
+    code = "import sys, differential; print('numba' in sys.modules, 'differential.jit' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    assert out.split() == ["False", "False"]